@@ -1,55 +1,215 @@
 # server/app.py
 import os
+import atexit
+import logging
 import hmac
 import hashlib
 import json
+import queue
+import random
+import signal
+import threading
+import time
 from datetime import datetime, timedelta
+from urllib.parse import quote, quote_plus, urlencode, urlsplit, unquote_plus
 
-from flask import Flask, request, jsonify, abort
+from flask import Flask, Response, request, jsonify, abort
+from flask.json.provider import DefaultJSONProvider, JSONProvider
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import bindparam, case, distinct, event, func, lambda_stmt, select
+from sqlalchemy.orm import joinedload, selectinload
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_cors import CORS
-from dotenv import load_dotenv
+from dotenv import dotenv_values, find_dotenv
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 try:
     import razorpay  # type: ignore
 
     _razorpay_available = True
 except Exception as _e:
-    print("Razorpay import failed; payment endpoints will be disabled:", _e)
+    logger.warning("Razorpay import failed; payment endpoints will be disabled: %s", _e)
     razorpay = None
     _razorpay_available = False
 
-load_dotenv()
-# Also load .env from the server directory explicitly (helps on Windows)
 try:
-    from pathlib import Path
+    import orjson  # type: ignore
+except Exception:
+    orjson = None  # falls back to Flask's stdlib json provider
+
+# The process environment as launched, before any .env file is applied
+_BOOT_ENV = dict(os.environ)
+
+
+def _env_file_values() -> dict:
+    """What the .env files contribute: the nearest .env only fills variables the process wasn't
+    started with, while server/.env (loaded explicitly, helps on Windows) overrides both."""
+    values = {}
+    path = find_dotenv()
+    if path:
+        values.update((k, v) for k, v in dotenv_values(path).items() if k not in _BOOT_ENV)
+    try:
+        from pathlib import Path
+
+        server_env = Path(__file__).parent / ".env"
+        if server_env.exists():
+            values.update(dotenv_values(server_env.as_posix()))
+    except Exception:
+        pass
+    return {k: v for k, v in values.items() if v is not None}
+
+
+def _load_env_files() -> None:
+    os.environ.update(_env_file_values())
 
-    server_env = Path(__file__).parent / ".env"
-    if server_env.exists():
-        load_dotenv(server_env.as_posix(), override=True)
-except Exception as _e:
-    pass
+
+_load_env_files()
 
 app: Flask = Flask(__name__)
 CORS(app)
 
+
+class OrjsonProvider(JSONProvider):
+    """orjson-backed app.json; types orjson can't handle go through Flask's default conversions."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
 # Config
+APP_ENV = os.getenv("APP_ENV", "production")
 DB_URI = os.getenv("DATABASE_URL", "sqlite:///ecommerce.db")
 app.config["SQLALCHEMY_DATABASE_URI"] = DB_URI
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+if DB_URI.startswith("sqlite"):
+    # SQLite keeps SQLAlchemy's default pool; just let pooled connections move between request threads
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"check_same_thread": False}}
+else:
+    # Keep warm connections around instead of reconnecting per request; size the pool to worker concurrency
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        # Sized for WSGI_THREADS (16) request threads per process plus bursts
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 20)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 40)),
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+    }
 
 db = SQLAlchemy(app)
 
+
+def _sqlite_pragmas(dbapi_conn, _record) -> None:
+    # WAL lets readers run alongside the single writer; NORMAL skips the fsync per commit that FULL does
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.close()
+
+
+if DB_URI.startswith("sqlite"):
+    with app.app_context():
+        event.listen(db.engine, "connect", _sqlite_pragmas)
+
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 RAZORPAY_WEBHOOK_SECRET = os.getenv("RAZORPAY_WEBHOOK_SECRET")
+# Seconds to wait on Razorpay's API (connect/read) before failing the request
+RAZORPAY_TIMEOUT = float(os.getenv("RAZORPAY_TIMEOUT", 10))
+
+
+_TRUTHY = frozenset({"1", "true", "True", "YES", "yes", "on", "ON"})
+_TEST_MODE = False
+_CONFIG_LOADED_AT = None
+
+
+def _read_test_mode(env) -> None:
+    global _TEST_MODE, _CONFIG_LOADED_AT
+    _TEST_MODE = env.get("ALLOW_TEST_PAYMENTS", "0") in _TRUTHY
+    _CONFIG_LOADED_AT = datetime.utcnow().replace(microsecond=0)
+
+
+# Test mode is read once at startup; after editing a .env file call reload_test_mode()
+# (python app.py also does it on SIGHUP). It re-resolves only this flag, with the same
+# precedence as startup, and leaves os.environ (DB URL, secrets) as the process booted with
+def reload_test_mode() -> None:
+    _read_test_mode({**_BOOT_ENV, **_env_file_values()})
 
 
-# Compute test mode dynamically from environment every time
 def is_test_mode() -> bool:
-    v = os.getenv("ALLOW_TEST_PAYMENTS", "0")
-    return v in {"1", "true", "True", "YES", "yes", "on", "ON"}
+    return _TEST_MODE
+
+
+_read_test_mode(os.environ)
+
+
+# Keyed once at import; copy() reuses the derived inner/outer pads instead of re-keying per request
+_HMAC_PAY = hmac.new(RAZORPAY_KEY_SECRET.encode(), b"", hashlib.sha256) if RAZORPAY_KEY_SECRET else None
+_HMAC_HOOK = hmac.new(RAZORPAY_WEBHOOK_SECRET.encode(), b"", hashlib.sha256) if RAZORPAY_WEBHOOK_SECRET else None
+
+
+def verify_hmac(template, body: bytes, provided_sig) -> bool:
+    """Constant-time check of a hex HMAC-SHA256 signature against a pre-keyed template."""
+    if template is None or not isinstance(provided_sig, str):
+        return False
+    h = template.copy()
+    h.update(body)
+    return hmac.compare_digest(h.hexdigest().encode(), provided_sig.encode())
+
+
+# /api/products body cache: version bumps on every product write, TTL covers writes from other workers
+_PRODUCTS_CACHE_TTL = 5.0
+_products_version = 0
+_products_cache = None  # (version, expires_at, etag, body)
+
+
+def bump_products_version() -> None:
+    global _products_version
+    _products_version += 1
+
+
+# Admin dashboard payloads are polled on every refresh and scan whole tables; keep them briefly
+ADMIN_STATS_KEY = "admin:stats:v1"
+ADMIN_USER_STATS_KEY = "admin:user-stats:v1"
+ADMIN_VENDOR_PERF_KEY = "admin:vendor-performance:v1"
+_admin_cache = {}  # key -> (expires_at, payload)
+
+
+def admin_cache_get(key):
+    entry = _admin_cache.get(key)
+    if entry and entry[0] > time.monotonic():
+        return entry[1]
+    return None
+
+
+def admin_cache_set(key, payload, ttl: float) -> None:
+    _admin_cache[key] = (time.monotonic() + ttl, payload)
+
+
+def invalidate_admin_cache(*keys) -> None:
+    for key in keys:
+        _admin_cache.pop(key, None)
+
+
+_UPI_BASE = "upi://pay"
+_QR_SERVICE_URL = "https://api.qrserver.com/v1/create-qr-code/?size=300x300&data="
+
+
+def _parse_upi(query: str) -> dict:
+    """Single pass over a UPI query string: first value per key wins, blank values are skipped (as parse_qs)."""
+    params = {}
+    for token in query.split("&"):
+        key, sep, value = token.partition("=")
+        if sep and value and key not in params:
+            params[key] = unquote_plus(value)
+    return params
 
 
 razorpay_client = None
@@ -57,13 +217,17 @@ if _razorpay_available and RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET:
     try:
         razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
     except Exception as _e:
-        print("Failed to initialize Razorpay client; disabling payments:", _e)
+        logger.warning("Failed to initialize Razorpay client; disabling payments: %s", _e)
         razorpay_client = None
 
 
 # --------------------
 # Models
 # --------------------
+# In dev, lazy loads on relationships raise, so endpoints must eager-load them instead of hiding an N+1
+_RELATIONSHIP_LAZY = "raise_on_sql" if APP_ENV == "dev" else "select"
+
+
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
@@ -73,6 +237,11 @@ class Product(db.Model):
     stock = db.Column(db.Integer, default=0)
     image = db.Column(db.String(50), nullable=True)
 
+    __table_args__ = (
+        # Low-stock lookups are a range scan on stock
+        db.Index("ix_product_stock", "stock"),
+    )
+
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -84,7 +253,8 @@ class Order(db.Model):
     customer_phone = db.Column(db.String(20), nullable=True)
     payment_id = db.Column(db.String(100), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    items = db.relationship("OrderItem", backref="order", cascade="all, delete-orphan")
+    items = db.relationship("OrderItem", backref="order", cascade="all, delete-orphan", lazy=_RELATIONSHIP_LAZY)
+    location = db.relationship("OrderLocation", uselist=False, backref="order", lazy=_RELATIONSHIP_LAZY)
 
 
 class OrderLocation(db.Model):
@@ -117,10 +287,21 @@ class User(db.Model):
     def set_password(self, password: str):
         self.password_hash = generate_password_hash(password)
 
+    def _set_test_password(self, password: str):
+        # Seeded demo accounts only: a cheap KDF keeps startup fast; real signups use set_password
+        self.password_hash = generate_password_hash(password, method="pbkdf2:sha256:1000")
+
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
 
 
+# Hash checked against when no account matches, so unknown emails cost the same as wrong passwords
+_DUMMY_HASH = generate_password_hash("x")
+# Approved vendors without an account get this constant temporary password, so hash it once
+# TODO: replace with a per-vendor reset link instead of a shared temporary password
+_TEMP_PW_HASH = generate_password_hash("temp_password_123")
+
+
 class UserActivity(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=True)
@@ -129,6 +310,13 @@ class UserActivity(db.Model):
     action = db.Column(db.String(50), nullable=False)  # signup | login
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # recent_activity pages newest-first by (created_at, id); lets it seek instead of sorting the table
+        db.Index("ix_useractivity_created_at_id", created_at.desc(), id.desc()),
+        # Per-role activity windows in admin stats; email/action make it covering for the user-stats scan
+        db.Index("ix_useractivity_role_created_email", "role", "created_at", "email", "action"),
+    )
+
 
 class VendorVerification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -143,6 +331,10 @@ class VendorVerification(db.Model):
     reviewed_at = db.Column(db.DateTime, nullable=True)
     reviewed_by = db.Column(db.String(120), nullable=True)  # admin email who reviewed
 
+    __table_args__ = (
+        db.Index("ix_vendorverif_status_created", "status", "created_at"),
+    )
+
 
 class CustomerRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -154,12 +346,169 @@ class CustomerRequest(db.Model):
     status = db.Column(db.String(50), default="pending")  # pending | notified | fulfilled
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_customerrequest_status_created", "status", "created_at"),
+    )
+
+
+# --------------------
+# Background writer for UserActivity rows (keeps the log insert off the auth request path)
+# --------------------
+_ACTIVITY_BATCH_SIZE = 500
+_activity_q = queue.Queue()
+_activity_writer = None
+_activity_writer_lock = threading.Lock()
+
+
+def log_activity(name, email, role, action) -> None:
+    """Queue a UserActivity row; the writer thread inserts queued rows in batches."""
+    global _activity_writer
+    _activity_q.put({"name": name, "email": email, "role": role, "action": action,
+                     "created_at": datetime.utcnow()})
+    # (Re)start the writer if it isn't running, so queued rows never just pile up
+    if _activity_writer is None or not _activity_writer.is_alive():
+        with _activity_writer_lock:
+            if _activity_writer is None or not _activity_writer.is_alive():
+                _activity_writer = threading.Thread(target=_activity_writer_loop, name="activity-writer",
+                                                    daemon=True)
+                _activity_writer.start()
+
+
+def _flush_activity(first=None) -> None:
+    batch = [first] if first else []
+    while len(batch) < _ACTIVITY_BATCH_SIZE:
+        try:
+            batch.append(_activity_q.get_nowait())
+        except queue.Empty:
+            break
+    if not batch:
+        return
+    with app.app_context():
+        try:
+            db.session.execute(db.insert(UserActivity), batch)
+            db.session.commit()
+        except Exception:
+            logger.exception("Error logging user activity")
+            db.session.rollback()
+
+
+def _activity_writer_loop() -> None:
+    while True:
+        try:
+            # Block for the first row, then take whatever else queued up meanwhile as one insert
+            _flush_activity(_activity_q.get())
+        except Exception:
+            # e.g. rollback() on a dead connection or app-context setup failing; keep the thread alive
+            logger.exception("Activity writer failed; continuing")
+            time.sleep(1.0)
+
+
+@atexit.register
+def _flush_pending_activity() -> None:
+    while not _activity_q.empty():
+        _flush_activity()
+
+
+# --------------------
+# Helper: add indexes declared on models to tables that already exist
+# --------------------
+# Indexes earlier versions created that no query uses any more; they only cost writes
+_DROPPED_INDEXES = ("ix_order_status_created", "ix_order_active", "ix_useractivity_role_created")
+
+
+def ensure_indexes() -> None:
+    # create_all() skips existing tables, so indexes added later would never reach old databases
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+    with db.engine.begin() as conn:
+        for name in _DROPPED_INDEXES:
+            conn.execute(db.text(f"DROP INDEX IF EXISTS {name}"))
+
+
+# --------------------
+# Hot lookups as lambda statements: each is constructed and cache-keyed once per call site,
+# later calls only extract the new bound values
+# --------------------
+def order_by_razorpay_id(order_id):
+    stmt = lambda_stmt(lambda: select(Order).where(Order.razorpay_order_id == order_id))
+    return db.session.execute(stmt).scalars().first()
+
+
+# Statuses a payment event must not move an order out of (same set the admin stats count as paid)
+_PAID_STATUSES = ("Paid", "delivered")
+
+
+def mark_order_paid(razorpay_order_id, payment_id) -> bool:
+    """Idempotent Created -> Paid transition; returns False when the order is missing or already paid."""
+    updated = db.session.execute(
+        db.update(Order)
+        .where(Order.razorpay_order_id == razorpay_order_id, Order.status.notin_(_PAID_STATUSES))
+        .values(status="Paid", payment_id=payment_id)
+    ).rowcount
+    if updated:
+        # Initialize tracking row unless one exists; only the transaction that won the UPDATE gets here
+        tracked = select(OrderLocation.id).where(OrderLocation.order_id == Order.id).exists()
+        db.session.execute(
+            OrderLocation.__table__.insert().from_select(
+                ["order_id", "status"],
+                select(Order.id, db.literal("Preparing"))
+                .where(Order.razorpay_order_id == razorpay_order_id, ~tracked),
+            )
+        )
+    return bool(updated)
+
+
+def mark_order_failed(razorpay_order_id) -> bool:
+    updated = db.session.execute(
+        db.update(Order)
+        .where(Order.razorpay_order_id == razorpay_order_id, Order.status.notin_(_PAID_STATUSES))
+        .values(status="Payment Failed")
+    ).rowcount
+    return bool(updated)
+
+
+def order_with_details(by_id=None, razorpay_order_id=None):
+    """Order with items and location eager-loaded, looked up by internal id or Razorpay order id."""
+    stmt = lambda_stmt(lambda: select(Order).options(selectinload(Order.items), joinedload(Order.location)))
+    if by_id is not None:
+        stmt += lambda s: s.where(Order.id == by_id)
+    else:
+        stmt += lambda s: s.where(Order.razorpay_order_id == razorpay_order_id)
+    return db.session.execute(stmt).unique().scalars().first()
+
+
+def products_by_id(ids):
+    stmt = lambda_stmt(lambda: select(Product).where(Product.id.in_(ids)))
+    return {p.id: p for p in db.session.execute(stmt).scalars()}
+
+
+# --------------------
+# Helper: optional ?page=&per_page= pagination for list endpoints
+# --------------------
+def paginate_rows(q):
+    """Return (rows, page_info). Without page/per_page args the full list is streamed, as before."""
+    if "page" not in request.args and "per_page" not in request.args:
+        return q.yield_per(500), None
+    try:
+        page = max(int(request.args.get("page", 1)), 1)
+        per_page = min(max(int(request.args.get("per_page", 50)), 1), 200)
+    except Exception:
+        page, per_page = 1, 50
+    pagination = q.paginate(page=page, per_page=per_page, error_out=False)
+    return pagination.items, {
+        "page": pagination.page,
+        "per_page": per_page,
+        "total": pagination.total,
+        "total_pages": pagination.pages,
+    }
+
 
 # --------------------
 # Helper: seed products (use your mock list)
 # --------------------
 def seed_products():
-    if Product.query.count() > 0:
+    if db.session.query(func.count(Product.id)).scalar() > 0:
         return
     mock_products = [
         {"id": 1, "name": "Fresh Tomatoes", "price": 40, "unit": "per kg", "category": "vegetables", "stock": 25,
@@ -191,7 +540,7 @@ def seed_products():
         )
         db.session.add(prod)
     db.session.commit()
-    print("Seeded products.")
+    logger.info("Seeded products.")
 
 
 # --------------------
@@ -199,15 +548,19 @@ def seed_products():
 # --------------------
 def seed_admin() -> None:
     admin_email = os.getenv("ADMIN_EMAIL", "admin@freshmarket.com")
-    admin_password = os.getenv("ADMIN_PASSWORD", "admin123")
+    admin_password = os.getenv("ADMIN_PASSWORD")
     existing = User.query.filter_by(email=admin_email).first()
     if existing:
         return
     admin = User(email=admin_email, role="admin")
-    admin.set_password(admin_password)
+    if admin_password:
+        admin.set_password(admin_password)
+    else:
+        # Default demo credential -> fast hash; a configured ADMIN_PASSWORD keeps the strong default
+        admin._set_test_password("admin123")
     db.session.add(admin)
     db.session.commit()
-    print(f"Seeded admin user: {admin_email}")
+    logger.info("Seeded admin user: %s", admin_email)
 
 
 def seed_test_users() -> None:
@@ -217,76 +570,122 @@ def seed_test_users() -> None:
         {"email": "vendor@test.com", "password": "test123", "role": "vendor"},
     ]
     
+    seeded = []
     for user_data in test_users:
         existing = User.query.filter_by(email=user_data["email"]).first()
         if existing:
             continue
         user = User(email=user_data["email"], role=user_data["role"])
-        user.set_password(user_data["password"])
+        user._set_test_password(user_data["password"])
         db.session.add(user)
-        db.session.commit()
-        print(f"Seeded {user_data['role']} user: {user_data['email']}")
+        seeded.append(user_data)
+    # One commit for the whole batch
+    db.session.commit()
+    for user_data in seeded:
+        logger.info("Seeded %s user: %s", user_data["role"], user_data["email"])
 
 
 # --------------------
 # Endpoints
 # --------------------
+# Everything but allowTestPayments is fixed at boot, so keep one serialized body per test-mode value
+_debug_config_bodies = {}
+
+
 @app.route("/api/debug-config", methods=["GET"])
 def debug_config():
-    return jsonify({
-        "allowTestPayments": is_test_mode(),
-        "razorpayEnabled": bool(razorpay_client),
-        "db": app.config.get("SQLALCHEMY_DATABASE_URI")
-    })
+    test_mode = is_test_mode()
+    body = _debug_config_bodies.get(test_mode)
+    if body is None:
+        body = app.json.response({
+            "allowTestPayments": test_mode,
+            "razorpayEnabled": bool(razorpay_client),
+            "db": app.config.get("SQLALCHEMY_DATABASE_URI")
+        }).get_data()
+        _debug_config_bodies[test_mode] = body
+    resp = Response(body, mimetype="application/json")
+    resp.last_modified = _CONFIG_LOADED_AT
+    return resp.make_conditional(request)
 
 
 @app.route("/api/products", methods=["GET"])
 def get_products():
-    prods = Product.query.all()
-    data = [
-        {
-            "id": p.id,
-            "name": p.name,
-            "price": p.price,
-            "unit": p.unit,
-            "category": p.category,
-            "stock": p.stock,
-            "image": p.image,
-        }
-        for p in prods
-    ]
-    return jsonify(data)
+    global _products_cache
+    cached = _products_cache
+    version = _products_version
+    if not cached or cached[0] != version or cached[1] <= time.monotonic():
+        cached = (version, time.monotonic() + _PRODUCTS_CACHE_TTL) + _render_products()
+        _products_cache = cached
+    etag, body = cached[2], cached[3]
+
+    # make_conditional compares If-None-Match weakly (RFC 9110), so proxy-weakened W/"..." still gets a 304
+    resp = Response(body, mimetype="application/json")
+    resp.set_etag(etag)
+    return resp.make_conditional(request)
+
+
+_PRODUCT_FIELDS = ("id", "name", "price", "unit", "category", "stock", "image")
+
+
+def _render_products():
+    # Plain column rows: no ORM instances or identity-map entries for a read-only listing
+    rows = db.session.execute(db.select(
+        Product.id, Product.name, Product.price, Product.unit, Product.category, Product.stock, Product.image
+    )).all()
+    data = [dict(zip(_PRODUCT_FIELDS, r)) for r in rows]
+    body = app.json.response(data).get_data()
+    return hashlib.sha1(body).hexdigest(), body
 
 
 @app.route("/api/admin/recent-activity", methods=["GET"])
 def recent_activity():
-    # Support simple pagination
+    # Keyset pagination: send nextCursor back as ?before=<created_at>&before_id=<id>.
+    # ?offset= still works for older clients but gets slower the deeper it pages.
     try:
-        limit = int(request.args.get("limit", 100))
+        limit = min(int(request.args.get("limit", 100)), 1000)
     except Exception:
         limit = 100
     try:
         offset = int(request.args.get("offset", 0))
     except Exception:
         offset = 0
-    q = UserActivity.query.order_by(UserActivity.created_at.desc())
-    acts = q.offset(offset).limit(min(limit, 1000)).all()
+    before = request.args.get("before")
+    before_id = request.args.get("before_id")
+
+    q = db.select(UserActivity.id, UserActivity.name, UserActivity.email, UserActivity.role, UserActivity.action,
+                  UserActivity.created_at).order_by(UserActivity.created_at.desc(), UserActivity.id.desc())
+    if before and before_id:
+        try:
+            cursor = (datetime.fromisoformat(before), int(before_id))
+        except Exception:
+            return jsonify({"error": "Invalid cursor"}), 400
+        q = q.where(db.tuple_(UserActivity.created_at, UserActivity.id) < cursor)
+        offset = None  # an offset means nothing relative to a cursor
+    elif offset:
+        q = q.offset(offset)
+    acts = db.session.execute(q.limit(limit)).all()
     data = [
         {
-            "name": a.name,
-            "email": a.email,
-            "role": a.role,
-            "action": a.action,
-            "created_at": a.created_at.isoformat(),
+            "name": name,
+            "email": email,
+            "role": role,
+            "action": action,
+            "created_at": created_at.isoformat(),
         }
-        for a in acts
+        for _id, name, email, role, action, created_at in acts
     ]
-    return jsonify({"items": data, "nextOffset": offset + len(data)})
+    next_cursor = None
+    if acts and len(acts) == limit:
+        next_cursor = {"before": acts[-1].created_at.isoformat(), "before_id": acts[-1].id}
+    body = {"items": data, "nextCursor": next_cursor}
+    if offset is not None:
+        body["nextOffset"] = offset + len(data)
+    return jsonify(body)
 
 
 @app.route("/api/products", methods=["POST"])
 def create_product():
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     name = (data.get("name") or "").strip()
     if not name:
         return jsonify({"error": "name is required"}), 400
@@ -305,6 +704,7 @@ def create_product():
     prod = Product(name=name, price=price, stock=stock, unit=unit, category=category, image=image)
     db.session.add(prod)
     db.session.commit()
+    bump_products_version()
     return jsonify({"success": True, "product": {
         "id": prod.id,
         "name": prod.name,
@@ -321,7 +721,7 @@ def update_product(pid: int):
     prod = Product.query.get(pid)
     if not prod:
         return jsonify({"error": "Product not found"}), 404
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     if "name" in data:
         prod.name = str(data.get("name") or prod.name)
     if "price" in data:
@@ -341,6 +741,7 @@ def update_product(pid: int):
     if "image" in data:
         prod.image = str(data.get("image") or "") or None
     db.session.commit()
+    bump_products_version()
     return jsonify({"success": True})
 
 
@@ -350,7 +751,7 @@ def add_to_cart():
     Decrease stock when an item is added to the cart.
     Expects JSON: { product_id: int, quantity: int }
     """
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     product_id = data.get("product_id")
     quantity = data.get("quantity", 1)
 
@@ -364,14 +765,19 @@ def add_to_cart():
     if quantity <= 0:
         return jsonify({"error": "Quantity must be positive"}), 400
 
-    product = Product.query.get(product_id)
-    if not product:
-        return jsonify({"error": "Product not found"}), 404
-    if product.stock < quantity:
-        return jsonify({"error": f"Insufficient stock. Available: {product.stock}"}), 400
-
-    product.stock -= quantity
+    # Check and decrement in one statement so concurrent adds cannot both pass the stock check
+    res = db.session.execute(
+        db.update(Product)
+        .where(Product.id == product_id, Product.stock >= quantity)
+        .values(stock=Product.stock - quantity)
+    )
     db.session.commit()
+    product = db.session.get(Product, product_id)
+    if res.rowcount == 0:
+        if not product:
+            return jsonify({"error": "Product not found"}), 404
+        return jsonify({"error": f"Insufficient stock. Available: {product.stock}"}), 400
+    bump_products_version()
 
     return jsonify({
         "success": True,
@@ -394,7 +800,7 @@ def bulk_add_to_cart():
     Add multiple items to cart in a single request.
     Expects JSON: { items: [{ product_id: int, quantity: int }, ...] }
     """
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     items = data.get("items", [])
 
     if not items or not isinstance(items, list):
@@ -408,6 +814,7 @@ def bulk_add_to_cart():
     successful_additions = 0
 
     # Validate all items first
+    parsed = []
     for i, item in enumerate(items):
         product_id = item.get("product_id")
         quantity = item.get("quantity", 1)
@@ -427,13 +834,25 @@ def bulk_add_to_cart():
             errors.append(f"Item {i+1}: Quantity must be positive")
             continue
 
-        product = Product.query.get(product_id)
+        parsed.append((i, product_id, quantity))
+
+    # Load every referenced product in one locked round-trip instead of one query per item
+    ids = {product_id for _, product_id, _ in parsed}
+    products = {}
+    if ids:
+        products = {p.id: p for p in Product.query.filter(Product.id.in_(ids)).with_for_update().all()}
+
+    # Remaining stock per product, so repeated lines for the same product see earlier decrements
+    remaining = {}
+    for i, product_id, quantity in parsed:
+        product = products.get(product_id)
         if not product:
             errors.append(f"Item {i+1}: Product not found")
             continue
 
-        if product.stock < quantity:
-            errors.append(f"Item {i+1}: Insufficient stock. Available: {product.stock}")
+        stock = remaining.get(product_id, product.stock)
+        if stock < quantity:
+            errors.append(f"Item {i+1}: Insufficient stock. Available: {stock}")
             continue
 
         results.append({
@@ -445,19 +864,35 @@ def bulk_add_to_cart():
                 "price": product.price,
                 "unit": product.unit,
                 "category": product.category,
-                "stock": product.stock,
+                "stock": stock,
                 "image": product.image,
             }
         })
+        remaining[product_id] = stock - quantity
+        successful_additions += 1
 
     # Proceed with stock updates for all valid items, even if some failed validation
     try:
-        for result in results:
-            product = Product.query.get(result["product_id"])
-            product.stock -= result["quantity"]
-            successful_additions += 1
-
+        if remaining:
+            # One executemany UPDATE for every touched product rather than a statement per row. The
+            # decrement is relative and guarded, like add_to_cart, so an add that lands after the
+            # SELECT above (the lock is a no-op on SQLite) can't be overwritten or oversold.
+            products_table = Product.__table__
+            stmt = (
+                products_table.update()
+                .where(products_table.c.id == bindparam("pid"), products_table.c.stock >= bindparam("qty"))
+                .values(stock=products_table.c.stock - bindparam("qty"))
+            )
+            params = [{"pid": pid, "qty": products[pid].stock - left} for pid, left in remaining.items()]
+            if db.engine.dialect.supports_sane_multi_rowcount:
+                applied = db.session.execute(stmt, params).rowcount
+            else:  # e.g. psycopg2 batches, so its rowcount only covers the last page
+                applied = sum(db.session.execute(stmt, row).rowcount for row in params)
+            if applied != len(params):
+                db.session.rollback()
+                return jsonify({"error": "Stock changed while adding items, please retry"}), 409
         db.session.commit()
+        bump_products_version()
 
         # If there were validation errors, return partial success
         if errors:
@@ -486,7 +921,7 @@ def remove_from_cart():
     Increase stock when an item is removed from the cart.
     Expects JSON: { product_id: int, quantity: int }
     """
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     product_id = data.get("product_id")
     quantity = data.get("quantity", 1)
 
@@ -506,6 +941,7 @@ def remove_from_cart():
 
     product.stock += quantity
     db.session.commit()
+    bump_products_version()
 
     return jsonify({
         "success": True,
@@ -528,7 +964,7 @@ def generate_upi_qr():
     Generate a dynamic UPI payment string and a QR code URL for the amount/order.
     Expects JSON: { amount: float, order_id: str }
     """
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     try:
         amount = float(data.get("amount") or 0)
     except Exception:
@@ -539,13 +975,16 @@ def generate_upi_qr():
         return jsonify({"error": "Invalid amount"}), 400
 
     upi_id = "freshmarket@paytm"
-    upi_string = (
-        f"upi://pay?pa={upi_id}&pn=FreshMarket&am={amount}&cu=INR&tn=Order%20{order_id}"
-    )
-    # Public QR service for demo purposes
-    qr_url = (
-            "https://api.qrserver.com/v1/create-qr-code/?size=300x300&data=" + upi_string
-    )
+    params = urlencode({
+        "pa": upi_id,
+        "pn": "FreshMarket",
+        "am": f"{amount:.2f}",
+        "cu": "INR",
+        "tn": f"Order {order_id}",
+    }, quote_via=quote, safe="@")
+    upi_string = f"{_UPI_BASE}?{params}"
+    # Public QR service for demo purposes; the UPI link is a single query value, so encode it whole
+    qr_url = _QR_SERVICE_URL + quote_plus(upi_string)
 
     return jsonify({
         "success": True,
@@ -563,7 +1002,7 @@ def scan_qr_payment():
     Process QR code payment
     Expects JSON: { qr_data: str, order_id: str, amount: float }
     """
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     qr_data = data.get("qr_data", "")
     order_id = data.get("order_id", "")
     amount = data.get("amount", 0)
@@ -573,16 +1012,14 @@ def scan_qr_payment():
 
     # Parse UPI QR code data
     try:
-        from urllib.parse import urlparse, parse_qs
-        parsed_url = urlparse(qr_data)
-        params = parse_qs(parsed_url.query)
+        params = _parse_upi(urlsplit(qr_data).query)
 
         # Extract UPI parameters
-        upi_id = params.get('pa', [''])[0]
-        merchant_name = params.get('pn', ['Merchant'])[0]
-        qr_amount = float(params.get('am', [amount])[0])
-        currency = params.get('cu', ['INR'])[0]
-        transaction_note = params.get('tn', ['Payment'])[0]
+        upi_id = params.get('pa', '')
+        merchant_name = params.get('pn', 'Merchant')
+        qr_amount = float(params.get('am', amount))
+        currency = params.get('cu', 'INR')
+        transaction_note = params.get('tn', 'Payment')
 
         # Validate UPI QR code format
         if not upi_id or '@' not in upi_id:
@@ -591,20 +1028,22 @@ def scan_qr_payment():
                 "error": "Invalid UPI QR code format"
             }), 400
 
-    except Exception as e:
+    except Exception:
         return jsonify({
             "success": False,
             "error": "Invalid QR code data"
         }), 400
 
     # Mock payment processing - in real implementation, you'd verify with UPI provider
-    import random
     success_rate = 0.9 if qr_amount <= 1000 else 0.8 if qr_amount <= 5000 else 0.7
     is_successful = random.random() < success_rate
 
     if is_successful:
+        # One timestamp shared by the stored payment id and the returned transaction id
+        payment_ref = f"qr_{int(time.time())}"
+
         # Create or update order status to paid
-        order = Order.query.filter_by(razorpay_order_id=order_id).first()
+        order = order_by_razorpay_id(order_id)
         if not order:
             # Create a new order if it doesn't exist
             order = Order(
@@ -618,13 +1057,14 @@ def scan_qr_payment():
             db.session.add(order)
 
         order.status = "Paid"
-        order.payment_id = f"qr_{int(datetime.utcnow().timestamp())}"
+        order.payment_id = payment_ref
         db.session.commit()
+        invalidate_admin_cache(ADMIN_STATS_KEY)
 
         return jsonify({
             "success": True,
             "message": "Payment processed successfully",
-            "transaction_id": f"qr_{int(datetime.utcnow().timestamp())}",
+            "transaction_id": payment_ref,
             "merchant": merchant_name,
             "amount": qr_amount,
             "currency": currency,
@@ -640,13 +1080,13 @@ def scan_qr_payment():
 @app.route("/api/auth/signup", methods=["POST"])
 def signup():
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         email = (data.get("email") or "").strip().lower()
         password = data.get("password") or ""
         role = (data.get("role") or "customer").strip().lower()
         name = (data.get("name") or data.get("fullName") or email.split('@')[0]).strip()
 
-        print(f"Signup attempt for email: {email}, role: {role}")  # Debug log
+        logger.debug("Signup attempt for email: %s, role: %s", email, role)
 
         if not email or not password:
             return jsonify({"error": "Email and password are required"}), 400
@@ -655,7 +1095,8 @@ def signup():
 
         existing_user = User.query.filter_by(email=email).first()
         if existing_user:
-            print(f"Email already registered: {email}")  # Debug log
+            check_password_hash(_DUMMY_HASH, password)
+            logger.info("Email already registered: %s", email)
             return jsonify({"error": "Email already registered"}), 409
 
         # Handle vendor signup differently - require admin approval
@@ -663,6 +1104,7 @@ def signup():
             # Check if vendor verification already exists
             existing_verification = VendorVerification.query.filter_by(vendor_email=email).first()
             if existing_verification:
+                check_password_hash(_DUMMY_HASH, password)
                 return jsonify({"error": "Vendor verification request already exists"}), 409
 
             # Check if user already exists
@@ -692,7 +1134,7 @@ def signup():
             
             db.session.commit()
 
-            print(f"Vendor verification request created for: {email}")  # Debug log
+            logger.info("Vendor verification request created for: %s", email)
 
             return jsonify({
                 "success": True,
@@ -706,41 +1148,45 @@ def signup():
         db.session.add(user)
         db.session.commit()
 
-        print(f"Signup successful for user: {user.email}, role: {user.role}")  # Debug log
+        logger.info("Signup successful for user: %s, role: %s", user.email, user.role)
 
-        try:
-            db.session.add(UserActivity(name=name, email=user.email, role=user.role, action="signup"))
-            db.session.commit()
-        except Exception as e:
-            print(f"Error logging user activity: {e}")  # Debug log
-            db.session.rollback()
+        log_activity(name=name, email=user.email, role=user.role, action="signup")
 
         return jsonify({
             "success": True,
             "user": {"id": user.id, "email": user.email, "role": user.role}
         }), 201
-    except Exception as e:
-        print(f"Signup error: {e}")  # Debug log
+    except Exception:
+        logger.exception("Signup error")
         return jsonify({"error": "Internal server error"}), 500
 
 
 @app.route("/api/auth/login", methods=["POST"])
 def login():
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         email = (data.get("email") or "").strip().lower()
         password = data.get("password") or ""
         name = (data.get("name") or data.get("fullName") or email.split('@')[0]).strip()
 
-        print(f"Login attempt for email: {email}")  # Debug log
+        logger.debug("Login attempt for email: %s", email)
 
         if not email or not password:
             return jsonify({"error": "Email and password are required"}), 400
 
-        user = User.query.filter_by(email=email).first()
+        # User and (for vendors) their verification row in one round-trip
+        row = db.session.execute(
+            db.select(User, VendorVerification)
+            .outerjoin(VendorVerification, VendorVerification.vendor_email == User.email)
+            .where(User.email == email)
+        ).first()
+        user, verification = row if row else (None, None)
         
         # Check if user doesn't exist but has a vendor verification request
         if not user:
+            # Pay the same KDF cost as a real password check to avoid leaking which emails exist
+            check_password_hash(_DUMMY_HASH, password)
+            # Rare path: no user row to join from, so look the verification up directly
             verification = VendorVerification.query.filter_by(vendor_email=email).first()
             if verification:
                 # User has a vendor verification request
@@ -759,16 +1205,15 @@ def login():
                 # If approved but no user created yet (shouldn't happen, but handle gracefully)
                 return jsonify({"error": "Account not fully activated. Please contact support."}), 500
             else:
-                print(f"User not found for email: {email}")  # Debug log
+                logger.info("User not found for email: %s", email)
                 return jsonify({"error": "Invalid credentials"}), 401
         
         if not user.check_password(password):
-            print(f"Invalid password for email: {email}")  # Debug log
+            logger.info("Invalid password for email: %s", email)
             return jsonify({"error": "Invalid credentials"}), 401
 
         # Check if vendor is approved
         if user.role == "vendor":
-            verification = VendorVerification.query.filter_by(vendor_email=email).first()
             if not verification or verification.status != "approved":
                 status = verification.status if verification else "pending"
                 return jsonify({
@@ -776,21 +1221,16 @@ def login():
                     "status": status
                 }), 403
 
-        print(f"Login successful for user: {user.email}, role: {user.role}")  # Debug log
+        logger.info("Login successful for user: %s, role: %s", user.email, user.role)
 
-        try:
-            db.session.add(UserActivity(name=name, email=user.email, role=user.role, action="login"))
-            db.session.commit()
-        except Exception as e:
-            print(f"Error logging user activity: {e}")  # Debug log
-            db.session.rollback()
+        log_activity(name=name, email=user.email, role=user.role, action="login")
 
         return jsonify({
             "success": True,
             "user": {"id": user.id, "email": user.email, "role": user.role}
         })
-    except Exception as e:
-        print(f"Login error: {e}")  # Debug log
+    except Exception:
+        logger.exception("Login error")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -802,25 +1242,20 @@ def logout():
     this endpoint is mainly for logging purposes.
     """
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         email = (data.get("email") or "").strip().lower()
         name = (data.get("name") or email.split('@')[0]).strip()
         role = data.get("role", "unknown")
 
         if email:
-            try:
-                db.session.add(UserActivity(name=name, email=email, role=role, action="logout"))
-                db.session.commit()
-            except Exception as e:
-                print(f"Error logging logout activity: {e}")
-                db.session.rollback()
+            log_activity(name=name, email=email, role=role, action="logout")
 
         return jsonify({
             "success": True,
             "message": "Logged out successfully"
         })
-    except Exception as e:
-        print(f"Logout error: {e}")
+    except Exception:
+        logger.exception("Logout error")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -831,10 +1266,8 @@ def get_stock_notifications():
     Returns products that are out of stock or low stock.
     """
     try:
-        # Get products with low or no stock
-        low_stock_products = Product.query.filter(
-            db.or_(Product.stock == 0, Product.stock < 10)
-        ).all()
+        # Get products with low or no stock (stock == 0 is within stock < 10)
+        low_stock_products = Product.query.filter(Product.stock < 10).order_by(Product.stock.asc()).all()
         
         notifications = []
         for product in low_stock_products:
@@ -857,8 +1290,8 @@ def get_stock_notifications():
             "notifications": notifications
         })
         
-    except Exception as e:
-        print(f"Error fetching stock notifications: {e}")
+    except Exception:
+        logger.exception("Error fetching stock notifications")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -870,7 +1303,12 @@ def get_customer_requests():
     """
     try:
         # Get all pending customer requests, ordered by creation date (newest first)
-        requests = CustomerRequest.query.filter_by(status="pending").order_by(CustomerRequest.created_at.desc()).all()
+        # Column rows streamed in batches: no ORM instances or identity map for a read-only list
+        requests = CustomerRequest.query.filter_by(status="pending").order_by(CustomerRequest.created_at.desc()) \
+            .with_entities(CustomerRequest.id, CustomerRequest.customer_email, CustomerRequest.customer_name,
+                           CustomerRequest.product_id, CustomerRequest.product_name, CustomerRequest.quantity,
+                           CustomerRequest.status, CustomerRequest.created_at)
+        requests, page_info = paginate_rows(requests)
         
         requests_list = []
         for req in requests:
@@ -887,11 +1325,12 @@ def get_customer_requests():
         
         return jsonify({
             "success": True,
-            "requests": requests_list
+            "requests": requests_list,
+            **(page_info or {})
         })
         
-    except Exception as e:
-        print(f"Error fetching customer requests: {e}")
+    except Exception:
+        logger.exception("Error fetching customer requests")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -901,7 +1340,7 @@ def submit_customer_request():
     Submit a customer request for out-of-stock item.
     """
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         
         customer_email = data.get("email", "").strip().lower()
         customer_name = data.get("name", "").strip()
@@ -913,11 +1352,11 @@ def submit_customer_request():
             return jsonify({"error": "Missing required fields"}), 400
         
         # Check if product exists and is out of stock
-        product = Product.query.get(product_id)
-        if not product:
+        row = db.session.query(Product.stock).filter(Product.id == product_id).first()
+        if row is None:
             return jsonify({"error": "Product not found"}), 404
         
-        if product.stock > 0:
+        if (row.stock or 0) > 0:
             return jsonify({"error": "Product is not out of stock"}), 400
         
         # Create the request
@@ -938,8 +1377,8 @@ def submit_customer_request():
             "request_id": request_obj.id
         })
         
-    except Exception as e:
-        print(f"Error submitting customer request: {e}")
+    except Exception:
+        logger.exception("Error submitting customer request")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -961,8 +1400,8 @@ def mark_request_notified(request_id):
             "message": "Request marked as notified"
         })
         
-    except Exception as e:
-        print(f"Error updating customer request: {e}")
+    except Exception:
+        logger.exception("Error updating customer request")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -971,56 +1410,55 @@ def get_admin_statistics():
     """
     Get comprehensive statistics for admin dashboard.
     """
+    cached = admin_cache_get(ADMIN_STATS_KEY)
+    if cached is not None:
+        return jsonify({"success": True, "statistics": cached})
     try:
-        # Count users by role
-        total_users = User.query.count()
-        total_customers = User.query.filter_by(role="customer").count()
-        total_vendors = User.query.filter_by(role="vendor").count()
-        total_admins = User.query.filter_by(role="admin").count()
-        
-        # Count approved vendors
-        approved_vendors = VendorVerification.query.filter_by(status="approved").count()
-        
-        # Count products
-        total_products = Product.query.count()
-        out_of_stock_products = Product.query.filter_by(stock=0).count()
-        low_stock_products = Product.query.filter(Product.stock > 0, Product.stock <= 10).count()
-        
-        # Count orders and compute active orders/value (active = not delivered)
-        total_orders = Order.query.count()
-        active_orders_q = Order.query.filter(Order.status != "delivered")
-        active_orders = active_orders_q.count()
-        active_orders_value = db.session.query(db.func.sum(Order.total)).filter(Order.status != "delivered").scalar() or 0
-        completed_orders = Order.query.filter_by(status="delivered").count()
+        # One aggregate pass per table instead of a COUNT round-trip per figure
+        total_users, total_customers, total_vendors, total_admins = db.session.query(
+            func.count(User.id),
+            func.count(case((User.role == "customer", 1))),
+            func.count(case((User.role == "vendor", 1))),
+            func.count(case((User.role == "admin", 1))),
+        ).one()
         
-        # Calculate revenue
-        completed_orders_revenue = db.session.query(db.func.sum(Order.total)).filter(Order.status.in_(["Paid","delivered"])) .scalar() or 0
+        # Count approved and pending vendor verifications
+        approved_vendors, pending_verifications = db.session.query(
+            func.count(case((VendorVerification.status == "approved", 1))),
+            func.count(case((VendorVerification.status == "pending", 1))),
+        ).one()
         
-        # Calculate today's revenue (SQLite compatible)
-        from datetime import date
-        today = datetime.now().date()
-        today_start = datetime.combine(today, datetime.min.time())
-        today_end = datetime.combine(today, datetime.max.time())
+        # Count products; inventory value = sum of vendors' items total amount of all products
+        total_products, out_of_stock_products, low_stock_products, inventory_value = db.session.query(
+            func.count(Product.id),
+            func.count(case((Product.stock == 0, 1))),
+            func.count(case(((Product.stock > 0) & (Product.stock <= 10), 1))),
+            func.coalesce(func.sum(Product.price * Product.stock), 0.0),
+        ).one()
         
-        today_revenue = db.session.query(db.func.sum(Order.total)).filter(
-            Order.status.in_(["Paid","delivered"]),
-            Order.created_at >= today_start,
-            Order.created_at <= today_end
-        ).scalar() or 0
-
-        # Inventory value = sum of vendors' items total amount of all products
-        inventory_value = db.session.query(db.func.sum(Product.price * Product.stock)).scalar() or 0
+        # Today's window for revenue, in UTC like created_at; half-open so midnight is counted exactly once
+        now = datetime.utcnow()
+        today_start = datetime(now.year, now.month, now.day)
+        tomorrow_start = today_start + timedelta(days=1)
         
-        # Count pending vendor verifications
-        pending_verifications = VendorVerification.query.filter_by(status="pending").count()
+        # Count orders and compute active orders/value (active = not delivered) and today's revenue
+        paid = Order.status.in_(["Paid", "delivered"])
+        today_paid = paid & (Order.created_at >= today_start) & (Order.created_at < tomorrow_start)
+        total_orders, active_orders, completed_orders, active_orders_value, today_revenue = db.session.query(
+            func.count(Order.id),
+            func.count(case((Order.status != "delivered", 1))),
+            func.count(case((Order.status == "delivered", 1))),
+            func.coalesce(func.sum(case((Order.status != "delivered", Order.total))), 0.0),
+            func.coalesce(func.sum(case((today_paid, Order.total))), 0.0),
+        ).one()
         
         # System uptime (mock for now - in real app, you'd track actual uptime)
         system_uptime = "99.8%"
         
         # Recent activity count (last 24 hours) - SQLite syntax
-        recent_activity = UserActivity.query.filter(
-            UserActivity.created_at >= datetime.utcnow() - timedelta(hours=24)
-        ).count()
+        recent_activity = db.session.query(func.count(UserActivity.id)).filter(
+            UserActivity.created_at >= now - timedelta(hours=24)
+        ).scalar()
         
         statistics = {
             "total_users": total_users,
@@ -1034,22 +1472,23 @@ def get_admin_statistics():
             "total_orders": total_orders,
             "active_orders": active_orders,
             "completed_orders": completed_orders,
-            "active_orders_value": float(active_orders_value),
+            "active_orders_value": active_orders_value,
             # As requested, treat total_revenue card as inventory value
-            "total_revenue": float(inventory_value),
-            "today_revenue": float(today_revenue),
+            "total_revenue": inventory_value,
+            "today_revenue": today_revenue,
             "pending_verifications": pending_verifications,
             "system_uptime": system_uptime,
             "recent_activity": recent_activity
         }
+        admin_cache_set(ADMIN_STATS_KEY, statistics, ttl=30)
         
         return jsonify({
             "success": True,
             "statistics": statistics
         })
         
-    except Exception as e:
-        print(f"Error fetching admin statistics: {e}")
+    except Exception:
+        logger.exception("Error fetching admin statistics")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -1059,7 +1498,13 @@ def get_vendor_verifications():
     Get all vendor verification requests for admin review.
     """
     try:
-        verifications = VendorVerification.query.order_by(VendorVerification.created_at.desc()).all()
+        # Column rows streamed in batches: no ORM instances or identity map for a read-only list
+        verifications = VendorVerification.query.order_by(VendorVerification.created_at.desc()) \
+            .with_entities(VendorVerification.id, VendorVerification.vendor_email, VendorVerification.vendor_name,
+                           VendorVerification.store_name, VendorVerification.owner_name, VendorVerification.phone,
+                           VendorVerification.status, VendorVerification.admin_notes, VendorVerification.created_at,
+                           VendorVerification.reviewed_at, VendorVerification.reviewed_by)
+        verifications, page_info = paginate_rows(verifications)
         
         verification_list = []
         for verification in verifications:
@@ -1079,11 +1524,12 @@ def get_vendor_verifications():
         
         return jsonify({
             "success": True,
-            "verifications": verification_list
+            "verifications": verification_list,
+            **(page_info or {})
         })
         
-    except Exception as e:
-        print(f"Error fetching vendor verifications: {e}")
+    except Exception:
+        logger.exception("Error fetching vendor verifications")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -1094,7 +1540,7 @@ def update_vendor_verification(verification_id):
     Expects JSON: { status: "approved" | "rejected", admin_notes: "optional notes" }
     """
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         status = data.get("status", "").strip().lower()
         admin_notes = data.get("admin_notes", "")
         admin_email = data.get("admin_email", "admin@freshmarket.com")  # In real app, get from session
@@ -1119,7 +1565,7 @@ def update_vendor_verification(verification_id):
                 # Create vendor user account
                 vendor_user = User(email=verification.vendor_email, role="vendor")
                 # Set a temporary password - vendor will need to reset it
-                vendor_user.set_password("temp_password_123")
+                vendor_user.password_hash = _TEMP_PW_HASH
                 db.session.add(vendor_user)
                 
                 # Log the approval activity
@@ -1131,14 +1577,15 @@ def update_vendor_verification(verification_id):
                 ))
         
         db.session.commit()
+        invalidate_admin_cache(ADMIN_STATS_KEY, ADMIN_VENDOR_PERF_KEY)
         
         return jsonify({
             "success": True,
             "message": f"Vendor verification {status} successfully"
         })
         
-    except Exception as e:
-        print(f"Error updating vendor verification: {e}")
+    except Exception:
+        logger.exception("Error updating vendor verification")
         db.session.rollback()
         return jsonify({"error": "Internal server error"}), 500
 
@@ -1146,23 +1593,29 @@ def update_vendor_verification(verification_id):
 @app.route("/api/admin/users", methods=["GET"])
 def admin_list_users():
     try:
-        users = User.query.all()
+        users, page_info = paginate_rows(User.query.order_by(User.id).with_entities(User.id, User.email, User.role))
         return jsonify({
             "success": True,
             "users": [
                 {"id": u.id, "email": u.email, "role": u.role}
                 for u in users
-            ]
+            ],
+            **(page_info or {})
         })
-    except Exception as e:
-        print(f"Error listing users: {e}")
+    except Exception:
+        logger.exception("Error listing users")
         return jsonify({"error": "Internal server error"}), 500
 
 
 @app.route("/api/admin/vendors", methods=["GET"])
 def admin_list_vendors():
     try:
-        verifications = VendorVerification.query.order_by(VendorVerification.created_at.desc()).all()
+        verifications = VendorVerification.query.filter_by(status="approved") \
+            .order_by(VendorVerification.created_at.desc()) \
+            .with_entities(VendorVerification.vendor_email, VendorVerification.vendor_name,
+                           VendorVerification.store_name, VendorVerification.phone, VendorVerification.status,
+                           VendorVerification.created_at)
+        verifications, page_info = paginate_rows(verifications)
         return jsonify({
             "success": True,
             "vendors": [
@@ -1174,11 +1627,12 @@ def admin_list_vendors():
                     "status": v.status,
                     "created_at": v.created_at.isoformat(),
                 }
-                for v in verifications if v.status == "approved"
-            ]
+                for v in verifications
+            ],
+            **(page_info or {})
         })
-    except Exception as e:
-        print(f"Error listing vendors: {e}")
+    except Exception:
+        logger.exception("Error listing vendors")
         return jsonify({"error": "Internal server error"}), 500
 
 
@@ -1187,58 +1641,73 @@ def admin_user_stats():
     """Compute user management stats: active customers (last 30d), new registrations (7d), retention%.
     Retention% = active_customers / total_customers * 100
     """
+    cached = admin_cache_get(ADMIN_USER_STATS_KEY)
+    if cached is not None:
+        return jsonify({"success": True, "stats": cached})
     try:
-        total_customers = User.query.filter_by(role="customer").count()
-
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        active_customers = UserActivity.query \
-            .filter(UserActivity.role == "customer", UserActivity.created_at >= thirty_days_ago) \
-            .with_entities(UserActivity.email).distinct().count()
-
-        seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        new_registrations = UserActivity.query \
-            .filter(UserActivity.role == "customer", UserActivity.action == "signup", UserActivity.created_at >= seven_days_ago) \
-            .count()
+        total_customers = db.session.query(func.count(User.id)).filter(User.role == "customer").scalar()
+
+        # Both activity figures from one index range scan over the last 30 days of customer rows
+        now = datetime.utcnow()
+        thirty_days_ago = now - timedelta(days=30)
+        seven_days_ago = now - timedelta(days=7)
+        new_signup = (UserActivity.action == "signup") & (UserActivity.created_at >= seven_days_ago)
+        active_customers, new_registrations = db.session.query(
+            func.count(distinct(UserActivity.email)),
+            func.count(case((new_signup, 1))),
+        ).filter(UserActivity.role == "customer", UserActivity.created_at >= thirty_days_ago).one()
 
         retention_percent = round((active_customers / total_customers) * 100.0, 2) if total_customers else 0.0
 
+        stats = {
+            "active_customers": active_customers,
+            "new_registrations": new_registrations,
+            "retention_percent": retention_percent,
+            "total_customers": total_customers,
+        }
+        admin_cache_set(ADMIN_USER_STATS_KEY, stats, ttl=60)
         return jsonify({
             "success": True,
-            "stats": {
-                "active_customers": active_customers,
-                "new_registrations": new_registrations,
-                "retention_percent": retention_percent,
-                "total_customers": total_customers,
-            }
+            "stats": stats
         })
-    except Exception as e:
-        print(f"Error computing user stats: {e}")
+    except Exception:
+        logger.exception("Error computing user stats")
         return jsonify({"error": "Internal server error"}), 500
 
 
 @app.route("/api/admin/vendor-performance", methods=["GET"])
 def admin_vendor_performance():
     """List approved vendors with placeholder orders/revenue (no vendor-order mapping available)."""
+    cached = admin_cache_get(ADMIN_VENDOR_PERF_KEY)
+    if cached is not None:
+        return jsonify({"success": True, "vendors": cached})
     try:
-        vendors = VendorVerification.query.filter_by(status="approved").order_by(VendorVerification.created_at.desc()).all()
+        vendors = VendorVerification.query.filter_by(status="approved") \
+            .order_by(VendorVerification.created_at.desc()) \
+            .with_entities(VendorVerification.vendor_email, VendorVerification.vendor_name,
+                           VendorVerification.store_name, VendorVerification.phone, VendorVerification.status,
+                           VendorVerification.created_at) \
+            .yield_per(500)
+        vendor_list = [
+            {
+                "email": v.vendor_email,
+                "name": v.vendor_name,
+                "store_name": v.store_name,
+                "phone": v.phone,
+                "orders": 0,
+                "revenue": 0.0,
+                "status": v.status,
+                "created_at": v.created_at.isoformat(),
+            }
+            for v in vendors
+        ]
+        admin_cache_set(ADMIN_VENDOR_PERF_KEY, vendor_list, ttl=60)
         return jsonify({
             "success": True,
-            "vendors": [
-                {
-                    "email": v.vendor_email,
-                    "name": v.vendor_name,
-                    "store_name": v.store_name,
-                    "phone": v.phone,
-                    "orders": 0,
-                    "revenue": 0.0,
-                    "status": v.status,
-                    "created_at": v.created_at.isoformat(),
-                }
-                for v in vendors
-            ]
+            "vendors": vendor_list
         })
-    except Exception as e:
-        print(f"Error computing vendor performance: {e}")
+    except Exception:
+        logger.exception("Error computing vendor performance")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route("/api/vendor/verification-status/<email>", methods=["GET"])
@@ -1264,11 +1733,16 @@ def get_vendor_verification_status(email):
             "reviewed_at": verification.reviewed_at.isoformat() if verification.reviewed_at else None
         })
         
-    except Exception as e:
-        print(f"Error checking vendor verification status: {e}")
+    except Exception:
+        logger.exception("Error checking vendor verification status")
         return jsonify({"error": "Internal server error"}), 500
 
 
+def _insert_order_items(order_id, items) -> None:
+    # One executemany Core INSERT; skips per-row ORM unit-of-work bookkeeping
+    db.session.execute(OrderItem.__table__.insert(), [{**it, "order_id": order_id} for it in items])
+
+
 @app.route("/api/create-order", methods=["POST"])
 def create_order():
     """
@@ -1276,7 +1750,7 @@ def create_order():
       { cart: { "<productId>": qty, ... }, address: "...", total: <client_total> }
     Server will compute total from DB for security, create Razorpay order, and store order.
     """
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     cart = data.get("cart") or {}
     address = data.get("address", "")
     customer_name = (data.get("name") or data.get("customer_name") or "").strip()
@@ -1288,15 +1762,17 @@ def create_order():
         return jsonify({"error": "Cart is empty"}), 400
 
     # compute total on server from DB (prevent client tampering)
+    try:
+        lines = [(int(pid_str), int(qty)) for pid_str, qty in cart.items()]
+    except Exception:
+        return jsonify({"error": "Invalid cart format"}), 400
+    # One IN query for every product in the cart
+    products = products_by_id([pid for pid, _ in lines])
+
     server_total = 0.0
     items = []
-    for pid_str, qty in cart.items():
-        try:
-            pid = int(pid_str)
-            qty = int(qty)
-        except Exception:
-            return jsonify({"error": "Invalid cart format"}), 400
-        product = Product.query.get(pid)
+    for pid, qty in lines:
+        product = products.get(pid)
         if not product:
             return jsonify({"error": f"Product {pid} not found"}), 404
         items.append({"product_id": pid, "product_name": product.name, "quantity": qty, "price": product.price})
@@ -1317,18 +1793,11 @@ def create_order():
         )
         db.session.add(order)
         db.session.flush()
-        for it in items:
-            oi = OrderItem(
-                order_id=order.id,
-                product_id=it["product_id"],
-                product_name=it["product_name"],
-                quantity=it["quantity"],
-                price=it["price"],
-            )
-            db.session.add(oi)
+        _insert_order_items(order.id, items)
         # Initialize tracking row
         db.session.add(OrderLocation(order_id=order.id, status="Preparing"))
         db.session.commit()
+        invalidate_admin_cache(ADMIN_STATS_KEY)
         return jsonify({
             "success": True,
             "orderId": order.razorpay_order_id,
@@ -1346,18 +1815,11 @@ def create_order():
                       address=address, customer_name=customer_name, customer_phone=customer_phone)
         db.session.add(order)
         db.session.flush()
-        for it in items:
-            oi = OrderItem(
-                order_id=order.id,
-                product_id=it["product_id"],
-                product_name=it["product_name"],
-                quantity=it["quantity"],
-                price=it["price"],
-            )
-            db.session.add(oi)
+        _insert_order_items(order.id, items)
         # Initialize tracking row
         db.session.add(OrderLocation(order_id=order.id, status="Preparing"))
         db.session.commit()
+        invalidate_admin_cache(ADMIN_STATS_KEY)
         return jsonify({
             "success": True,
             "orderId": order.razorpay_order_id,
@@ -1366,14 +1828,16 @@ def create_order():
             "internalOrderId": order.id,
             "testMode": True
         })
+    # End the read transaction so the pooled connection isn't held across the HTTPS round trip
+    db.session.rollback()
     try:
         razorpay_order = razorpay_client.order.create({
             "amount": amount_in_paise,
             "currency": "INR",
             "payment_capture": 1  # auto capture (or 0 for manual)
-        })
-    except Exception as e:
-        print("Razorpay order create error:", e)
+        }, timeout=RAZORPAY_TIMEOUT)
+    except Exception:
+        logger.exception("Razorpay order create error")
         return jsonify({"error": "Could not create payment order"}), 500
 
     # Persist Order & OrderItems
@@ -1382,17 +1846,9 @@ def create_order():
     db.session.add(order)
     db.session.flush()  # to get order.id
 
-    for it in items:
-        oi = OrderItem(
-            order_id=order.id,
-            product_id=it["product_id"],
-            product_name=it["product_name"],
-            quantity=it["quantity"],
-            price=it["price"],
-        )
-        db.session.add(oi)
-
+    _insert_order_items(order.id, items)
     db.session.commit()
+    invalidate_admin_cache(ADMIN_STATS_KEY)
 
     return jsonify({
         "success": True,
@@ -1409,7 +1865,7 @@ def verify_payment():
     Expects:
       { razorpay_order_id, razorpay_payment_id, razorpay_signature }
     """
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     order_id = data.get("razorpay_order_id")
     payment_id = data.get("razorpay_payment_id")
     signature = data.get("razorpay_signature")
@@ -1417,24 +1873,11 @@ def verify_payment():
     if not (order_id and payment_id and signature):
         return jsonify({"error": "Missing parameters"}), 400
 
-    generated_sig = hmac.new(RAZORPAY_KEY_SECRET.encode(), f"{order_id}|{payment_id}".encode(),
-                             hashlib.sha256).hexdigest()
-
-    if hmac.compare_digest(generated_sig, signature):
+    if verify_hmac(_HMAC_PAY, f"{order_id}|{payment_id}".encode(), signature):
         # mark DB order as paid
-        order = Order.query.filter_by(razorpay_order_id=order_id).first()
-        if order:
-            order.status = "Paid"
-            order.payment_id = payment_id
-            # Initialize tracking row on payment success
-            try:
-                existing = OrderLocation.query.filter_by(order_id=order.id).first()
-            except Exception:
-                existing = None
-            if not existing:
-                loc = OrderLocation(order_id=order.id, status="Preparing")
-                db.session.add(loc)
+        if mark_order_paid(order_id, payment_id):
             db.session.commit()
+            invalidate_admin_cache(ADMIN_STATS_KEY)
         return jsonify({"success": True, "message": "Payment verified"})
     else:
         return jsonify({"success": False, "error": "Invalid signature"}), 400
@@ -1442,12 +1885,12 @@ def verify_payment():
 
 @app.route("/api/order-status/<string:order_id>", methods=["GET"])
 def order_status(order_id):
-    # Accept either internal numeric id or razorpay order id
-    order = None
+    # Accept either internal numeric id or razorpay order id; the reference ids we issue
+    # (order_*, cod_*, test_*) are never all digits, so one lookup decides it
     if order_id.isdigit():
-        order = Order.query.get(int(order_id))
-    if not order:
-        order = Order.query.filter_by(razorpay_order_id=order_id).first()
+        order = order_with_details(by_id=int(order_id))
+    else:
+        order = order_with_details(razorpay_order_id=order_id)
     if not order:
         return jsonify({"error": "Order not found"}), 404
 
@@ -1470,7 +1913,7 @@ def order_status(order_id):
         for it in order.items
     ]
     # attach location if present
-    loc = OrderLocation.query.filter_by(order_id=order.id).first()
+    loc = order.location
     location = None
     if loc:
         location = {
@@ -1513,7 +1956,7 @@ def order_location(order_id: int):
         })
 
     # POST - update
-    data = request.get_json() or {}
+    data = request.get_json(silent=True) or {}
     lat = data.get("latitude")
     lng = data.get("longitude")
     status = data.get("status")
@@ -1547,38 +1990,25 @@ def webhook():
     if not signature or not RAZORPAY_WEBHOOK_SECRET:
         return jsonify({"error": "Missing webhook signature or secret"}), 400
 
-    expected = hmac.new(RAZORPAY_WEBHOOK_SECRET.encode(), raw, hashlib.sha256).hexdigest()
-    if not hmac.compare_digest(expected, signature):
-        print("Webhook signature mismatch")
+    if not verify_hmac(_HMAC_HOOK, raw, signature):
+        logger.warning("Webhook signature mismatch")
         return jsonify({"error": "Invalid signature"}), 400
 
-    payload = request.get_json()
+    payload = request.get_json(silent=True) or {}
     event = payload.get("event")
     # Example: payment.captured
     if event == "payment.captured":
         payment = payload.get("payload", {}).get("payment", {}).get("entity", {})
         order_id = payment.get("order_id")
-        if order_id:
-            order = Order.query.filter_by(razorpay_order_id=order_id).first()
-            if order:
-                order.status = "Paid"
-                order.payment_id = payment.get("id")
-                try:
-                    existing = OrderLocation.query.filter_by(order_id=order.id).first()
-                except Exception:
-                    existing = None
-                if not existing:
-                    loc = OrderLocation(order_id=order.id, status="Preparing")
-                    db.session.add(loc)
-                db.session.commit()
+        if order_id and mark_order_paid(order_id, payment.get("id")):
+            db.session.commit()
+            invalidate_admin_cache(ADMIN_STATS_KEY)
     elif event == "payment.failed":
         payment = payload.get("payload", {}).get("payment", {}).get("entity", {})
         order_id = payment.get("order_id")
-        if order_id:
-            order = Order.query.filter_by(razorpay_order_id=order_id).first()
-            if order:
-                order.status = "Payment Failed"
-                db.session.commit()
+        if order_id and mark_order_failed(order_id):
+            db.session.commit()
+            invalidate_admin_cache(ADMIN_STATS_KEY)
 
     return jsonify({"ok": True})
 
@@ -1587,8 +2017,12 @@ def webhook():
 # Run + init
 # --------------------
 if __name__ == "__main__":
+    # Only for the standalone server: under gunicorn the master owns SIGHUP (it reloads workers)
+    if hasattr(signal, "SIGHUP"):  # not available on Windows
+        signal.signal(signal.SIGHUP, lambda _signum, _frame: reload_test_mode())
     with app.app_context():
         db.create_all()
+        ensure_indexes()
         seed_products()
         seed_admin()
         seed_test_users()
@@ -1599,4 +2033,15 @@ if __name__ == "__main__":
         print("   Customer: customer@test.com / test123")
         print("   Vendor: vendor@test.com / test123")
         print("-" * 50)
-        app.run(host="0.0.0.0", port=port, debug=True)
+        debug = os.getenv("FLASK_DEBUG", "0") in _TRUTHY
+        try:
+            from waitress import serve  # type: ignore
+        except ImportError:
+            serve = None
+        if serve is not None and not debug:
+            # Multi-threaded production WSGI server (works on Windows too)
+            serve(app, host="0.0.0.0", port=port, threads=int(os.getenv("WSGI_THREADS", 16)))
+        else:
+            # Threaded dev server; on Linux you can also run under gunicorn, e.g.
+            #   gunicorn -w 4 -k gthread --threads 8 -b 0.0.0.0:5000 app:app   (from the server/ directory)
+            app.run(host="0.0.0.0", port=port, debug=debug, threaded=True)
@@ -1,79 +1,152 @@
 #!/usr/bin/env python3
 """
 Test script for authentication endpoints
+
+The independent account flows already overlap, each on its own pooled keep-alive connection.
+The backend (Werkzeug dev server, waitress or gunicorn) only speaks HTTP/1.1, so an HTTP/2
+client would fall back to that anyway and multiplexing has nothing to gain here.
 """
+import io
+import os
+import socket
+import sys
+import time
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Final
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-BASE_URL = "http://localhost:5000"
+# IP literal rather than "localhost": skips the resolver on connect, and the server binds
+# 0.0.0.0 (IPv4 only), so it never tries ::1 first
+BASE_URL = "http://127.0.0.1:5000"
+LOGIN_URL = f"{BASE_URL}/api/auth/login"
+SIGNUP_URL = f"{BASE_URL}/api/auth/signup"
+# (connect, read) seconds: fail fast when the server isn't running instead of hanging on connect
+TIMEOUT = (1.0, 3.0)
+# Set TEST_AUTH_ITERS > 1 to rerun every case and compare cold-connect vs warm-pool latency
+N = max(1, int(os.getenv("TEST_AUTH_ITERS", "1")))
 
-def test_auth():
-    print("Testing Authentication Endpoints...")
-    print("=" * 50)
-    
-    # Test admin login
-    print("\n1. Testing Admin Login...")
-    admin_data = {
-        "email": "admin@freshmarket.com",
-        "password": "admin123"
-    }
-    
-    try:
-        response = requests.post(f"{BASE_URL}/api/auth/login", json=admin_data)
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {response.json()}")
-    except Exception as e:
-        print(f"Error: {e}")
-    
-    # Test customer signup
-    print("\n2. Testing Customer Signup...")
-    customer_data = {
-        "email": "test@customer.com",
-        "password": "test123",
-        "role": "customer",
-        "name": "Test Customer"
-    }
-    
-    try:
-        response = requests.post(f"{BASE_URL}/api/auth/signup", json=customer_data)
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {response.json()}")
-    except Exception as e:
-        print(f"Error: {e}")
-    
-    # Test customer login
-    print("\n3. Testing Customer Login...")
-    try:
-        response = requests.post(f"{BASE_URL}/api/auth/login", json=customer_data)
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {response.json()}")
-    except Exception as e:
-        print(f"Error: {e}")
-    
-    # Test vendor signup
-    print("\n4. Testing Vendor Signup...")
-    vendor_data = {
-        "email": "test@vendor.com",
-        "password": "test123",
-        "role": "vendor",
-        "name": "Test Vendor"
-    }
-    
+# Small JSON POSTs must not wait on Nagle / delayed ACK. urllib3's default is just TCP_NODELAY;
+# spell it out (passing socket_options replaces the default) and add SO_KEEPALIVE for idle pooled
+# sockets. Nagle on the server's side is the server's concern; it writes each response in one go.
+SOCKET_OPTIONS = [
+    (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+
+class LowLatencyAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+# One keep-alive connection pool for every call, instead of a new TCP connection per request.
+# A single host needs a single pool; maxsize leaves an idle connection per concurrent flow, and
+# retries stay off so a refused connection is reported right away instead of being retried.
+SESSION = requests.Session()
+SESSION.mount("http://", LowLatencyAdapter(pool_connections=1, pool_maxsize=16, max_retries=Retry(total=0)))
+SESSION.headers["Connection"] = "keep-alive"
+
+ADMIN_DATA: Final[dict] = {
+    "email": "admin@freshmarket.com",
+    "password": "admin123"
+}
+CUSTOMER_DATA: Final[dict] = {
+    "email": "test@customer.com",
+    "password": "test123",
+    "role": "customer",
+    "name": "Test Customer"
+}
+VENDOR_DATA: Final[dict] = {
+    "email": "test@vendor.com",
+    "password": "test123",
+    "role": "vendor",
+    "name": "Test Vendor"
+}
+
+# Bodies are serialized once here (compact, no padding spaces) and sent as-is, instead of
+# json= re-encoding them on every POST
+_COMPACT = (",", ":")
+ADMIN_BODY: Final[bytes] = json.dumps(ADMIN_DATA, separators=_COMPACT).encode()
+CUSTOMER_BODY: Final[bytes] = json.dumps(CUSTOMER_DATA, separators=_COMPACT).encode()
+VENDOR_BODY: Final[bytes] = json.dumps(VENDOR_DATA, separators=_COMPACT).encode()
+JSON_HEADERS: Final[dict] = {"Content-Type": "application/json"}
+
+# (label, account, url, body): cases sharing an account form one flow and run in this order
+CASES = [
+    ("Admin Login", ADMIN_DATA["email"], LOGIN_URL, ADMIN_BODY),
+    ("Customer Signup", CUSTOMER_DATA["email"], SIGNUP_URL, CUSTOMER_BODY),
+    ("Customer Login", CUSTOMER_DATA["email"], LOGIN_URL, CUSTOMER_BODY),
+    ("Vendor Signup", VENDOR_DATA["email"], SIGNUP_URL, VENDOR_BODY),
+    ("Vendor Login", VENDOR_DATA["email"], LOGIN_URL, VENDOR_BODY),
+]
+
+# URL, headers and body never change, so each case is prepared once and resent as-is
+PREPARED = {
+    label: SESSION.prepare_request(requests.Request("POST", url, data=body, headers=JSON_HEADERS))
+    for label, _, url, body in CASES
+}
+
+def _run(i, label, with_body=True):
+    """POST one case into its own buffer and return (report, completed).
+
+    The response is streamed, so status-only runs (with_body=False) never buffer or decode the body;
+    they drain it instead, which is what lets the connection go back to the pool for reuse.
+    """
+    buf = io.StringIO()
+    buf.write(f"\n{i}. Testing {label}...\n")
     try:
-        response = requests.post(f"{BASE_URL}/api/auth/signup", json=vendor_data)
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {response.json()}")
+        with SESSION.send(PREPARED[label], timeout=TIMEOUT, stream=True) as response:
+            buf.write(f"Status Code: {response.status_code}\n")
+            if with_body:
+                buf.write(f"Response: {response.content.decode('utf-8', 'replace').strip()}\n")
+            else:
+                response.raw.drain_conn()
     except Exception as e:
-        print(f"Error: {e}")
-    
-    # Test vendor login
-    print("\n5. Testing Vendor Login...")
+        buf.write(f"Error: {e}\n")
+        return buf.getvalue(), False
+    return buf.getvalue(), True
+
+def _run_flow(flow, with_body=True):
+    # Cases for one account run in table order, so its signup lands before its login
+    return [(i, *_run(i, label, with_body)) for i, label in flow]
+
+def test_auth():
+    # Cases for different accounts don't depend on each other, so each account's chain runs concurrently
+    flows = {}
+    for i, (label, account, _, _) in enumerate(CASES, 1):
+        flows.setdefault(account, []).append((i, label))
+    timings = []
+    failed = set()
     try:
-        response = requests.post(f"{BASE_URL}/api/auth/login", json=vendor_data)
-        print(f"Status Code: {response.status_code}")
-        print(f"Response: {response.json()}")
-    except Exception as e:
-        print(f"Error: {e}")
+        with ThreadPoolExecutor(max_workers=len(flows)) as pool:
+            for n in range(N):
+                # Only the first iteration is reported, so later ones just check status codes
+                run_flow = partial(_run_flow, with_body=n == 0)
+                t0 = time.perf_counter()
+                iteration = [case for flow in pool.map(run_flow, flows.values()) for case in flow]
+                timings.append(time.perf_counter() - t0)
+                failed.update(i for i, _, completed in iteration if not completed)
+                if len(timings) == 1:
+                    results = iteration  # later iterations only feed the timings
+    finally:
+        SESSION.close()
+    # One write for the whole report, in case order whichever flow finished first
+    report = ["Testing Authentication Endpoints...\n", "=" * 50 + "\n"]
+    report += [text for _, text, _ in sorted(results)]
+    report.append(f"\n{N} iteration(s): {sum(timings) / (N * len(CASES)) * 1000:.1f} ms per case (wall time / cases)\n")
+    report.append(f"Cold (iteration 1): {timings[0] * 1000:.1f} ms\n")
+    if N > 1:
+        warm = timings[1:]
+        report.append(f"Warm (iterations 2-{N}, mean): {sum(warm) / len(warm) * 1000:.1f} ms\n")
+    sys.stdout.write("".join(report))
+
+    # Status codes depend on what the database already holds (a rerun signs up existing accounts),
+    # so only cases that never got a response fail the run; that is what CI needs to notice
+    if failed:
+        sys.exit(f"\n{len(failed)} of {len(CASES)} cases got no response: {sorted(failed)}")
 
 if __name__ == "__main__":
     test_auth()